@@ -80,30 +80,48 @@ class OwnersClient(object):
 
   def ScoreOwners(self, paths, exclude=None):
     """Get sorted list of owners for the given paths."""
+    return self._ScoreOwners(paths, self.BatchListOwners(paths), exclude)
+
+  def SuggestOwners(self, paths, exclude=None):
+    """Suggest a set of owners for the given paths."""
+    return self._SuggestOwners(paths, self.BatchListOwners(paths), exclude)
+
+  def BatchSuggestOwners(self, paths_by_group, exclude=None):
+    """Suggest a set of owners for each group of paths.
+
+    Owners of the paths in all groups are listed at once rather than one group
+    at a time.
+
+    Returns a dictionary {group: [owners]}.
+    """
+    owners_by_path = self.BatchListOwners(
+        {path for paths in paths_by_group.values() for path in paths})
+    return {
+        group: self._SuggestOwners(paths, owners_by_path, exclude)
+        for group, paths in paths_by_group.items()
+    }
+
+  def _ScoreOwners(self, paths, owners_by_path, exclude):
     if not paths:
       return []
     exclude = exclude or []
     owners = []
-    queues = self.BatchListOwners(paths).values()
+    queues = [owners_by_path[path] for path in paths]
     for i in range(max(len(q) for q in queues)):
       for q in queues:
         if i < len(q) and q[i] not in owners and q[i] not in exclude:
           owners.append(q[i])
     return owners
 
-  def SuggestOwners(self, paths, exclude=None):
-    """Suggest a set of owners for the given paths."""
-    exclude = exclude or []
-
+  def _SuggestOwners(self, paths, owners_by_path, exclude):
     paths_by_owner = {}
-    owners_by_path = self.BatchListOwners(paths)
-    for path, owners in owners_by_path.items():
-      for owner in owners:
+    for path in paths:
+      for owner in owners_by_path[path]:
         paths_by_owner.setdefault(owner, set()).add(path)
 
     selected = []
     missing = set(paths)
-    for owner in self.ScoreOwners(paths, exclude=exclude):
+    for owner in self._ScoreOwners(paths, owners_by_path, exclude):
       missing_len = len(missing)
       missing.difference_update(paths_by_owner[owner])
       if missing_len > len(missing):
@@ -27,23 +27,34 @@ import git_common as git
 # in the past.
 CL_SPLIT_FORCE_LIMIT = 10
 
+# Matches a bug link in a CL description. Examples:
+#   Bug: 123
+#   Bug: chromium:456
+BUG_RE = re.compile(r'^Bug:\s*(?:[a-zA-Z]+:)?[0-9]+', re.MULTILINE)
+
 
 def EnsureInGitRepository():
   """Throws an exception if the current directory is not a git repository."""
   git.run('rev-parse')
 
 
-def CreateBranchForDirectory(prefix, directory, upstream):
+def GetBranchName(prefix, directory):
+  """Returns the name of the branch used to upload the CL for |directory|."""
+  return prefix + '_' + directory + '_split'
+
+
+def CreateBranchForDirectory(prefix, directory, upstream, existing_branches):
   """Creates a branch named |prefix| + "_" + |directory| + "_split".
 
   Return false if the branch already exists. |upstream| is used as upstream for
-  the created branch.
+  the created branch. |existing_branches| is the set of local branch names,
+  which is updated with the created branch.
   """
-  existing_branches = set(git.branches(use_limit = False))
-  branch_name = prefix + '_' + directory + '_split'
+  branch_name = GetBranchName(prefix, directory)
   if branch_name in existing_branches:
     return False
   git.run('checkout', '-t', upstream, '-b', branch_name)
+  existing_branches.add(branch_name)
   return True
 
 
@@ -52,25 +63,36 @@ def FormatDescriptionOrComment(txt, directory):
   return txt.replace('$directory', '/' + directory)
 
 
+def FormatPathspecs(paths):
+  """Returns |paths| encoded for git's --pathspec-from-file=- option.
+
+  Paths are NUL-separated so that they are taken literally and must be used
+  along with --pathspec-file-nul.
+  """
+  return '\0'.join(paths).encode('utf-8')
+
+
 def AddUploadedByGitClSplitToDescription(description):
   """Adds a 'This CL was uploaded by git cl split.' line to |description|.
 
   The line is added before footers, or at the end of |description| if it has no
   footers.
   """
-  split_footers = git_footers.split_footers(description)
-  lines = split_footers[0]
+  # split_footers() returns new lists, so they can be extended in place.
+  lines, footer_lines, _ = git_footers.split_footers(description)
   if lines[-1] and not lines[-1].isspace():
-    lines = lines + ['']
-  lines = lines + ['This CL was uploaded by git cl split.']
-  if split_footers[1]:
-    lines += [''] + split_footers[1]
+    lines.append('')
+  lines.append('This CL was uploaded by git cl split.')
+  if footer_lines:
+    lines.append('')
+    lines.extend(footer_lines)
   return '\n'.join(lines)
 
 
 def UploadCl(refactor_branch, refactor_branch_upstream, directory, files,
              description, comment, reviewers, changelist, cmd_upload,
-             cq_dry_run, enable_auto_submit, topic, repository_root):
+             cq_dry_run, enable_auto_submit, topic, repository_root,
+             existing_branches):
   """Uploads a CL with all changes to |files| in |refactor_branch|.
 
   Args:
@@ -87,35 +109,32 @@ def UploadCl(refactor_branch, refactor_branch_upstream, directory, files,
     cq_dry_run: If CL uploads should also do a cq dry run.
     enable_auto_submit: If CL uploads should also enable auto submit.
     topic: Topic to associate with uploaded CLs.
+    repository_root: Absolute path of the repository root.
+    existing_branches: Set of local branch names, shared across calls.
   """
   # Create a branch.
-  if not CreateBranchForDirectory(
-      refactor_branch, directory, refactor_branch_upstream):
+  if not CreateBranchForDirectory(refactor_branch, directory,
+                                  refactor_branch_upstream, existing_branches):
     print('Skipping ' + directory + ' for which a branch already exists.')
     return
 
-  # Checkout all changes to files in |files|.
-  deleted_files = []
-  modified_files = []
-  for action, f in files:
-    abspath = os.path.abspath(os.path.join(repository_root, f))
-    if action == 'D':
-      deleted_files.append(abspath)
-    else:
-      modified_files.append(abspath)
-
-  if deleted_files:
-    git.run(*['rm'] + deleted_files)
-  if modified_files:
-    git.run(*['checkout', refactor_branch, '--'] + modified_files)
-
-  # Commit changes. The temporary file is created with delete=False so that it
-  # can be deleted manually after git has read it rather than automatically
-  # when it is closed.
-  with gclient_utils.temporary_file() as tmp_file:
-    gclient_utils.FileWrite(
-        tmp_file, FormatDescriptionOrComment(description, directory))
-    git.run('commit', '-F', tmp_file)
+  # Checkout all changes to files in |files|. git restore stages and checks
+  # out modifications, additions and deletions alike, so a single invocation
+  # covers every action. Paths are passed through stdin rather than as
+  # arguments so that large CLs don't hit command line length limits.
+  # |repository_root| is absolute and |files| are relative to it, so plain
+  # concatenation is enough to make absolute paths.
+  root_with_sep = repository_root + os.path.sep
+  paths = [root_with_sep + f for _, f in files]
+  git.run('restore', '--source=' + refactor_branch, '--staged', '--worktree',
+          '--pathspec-from-file=-', '--pathspec-file-nul',
+          indata=FormatPathspecs(paths))
+
+  # Commit changes. The message is read from stdin rather than from a
+  # temporary file.
+  git.run('commit', '-F', '-',
+          indata=FormatDescriptionOrComment(description,
+                                            directory).encode('utf-8'))
 
   # Upload a CL.
   upload_args = ['-f']
@@ -146,24 +165,56 @@ def UploadCl(refactor_branch, refactor_branch_upstream, directory, files,
 def GetFilesSplitByOwners(files, max_depth):
   """Returns a map of files split by OWNERS file.
 
+  Args:
+    files: An iterable of (action, path) tuples, as returned by
+        scm.GIT.CaptureStatus(). Whitespace around actions is stripped.
+    max_depth: The maximum directory depth to search for OWNERS files. A value
+        less than 1 means no limit.
+
   Returns:
     A map where keys are paths to directories containing an OWNERS file and
     values are lists of files sharing an OWNERS file.
   """
   files_split_by_owners = {}
+  # Maps every directory visited while looking for OWNERS files to its closest
+  # parent with an OWNERS file, so that walks from sibling directories stop at
+  # their first shared ancestor. It is seeded with the directories of all
+  # OWNERS files in the repository, listed at once from the index rather than
+  # probing the filesystem for each directory.
+  owners_files = git.run('ls-files', '-z', '--full-name', '--',
+                         ':(top,glob)**/OWNERS').split('\0')
+  owners_dir_by_ancestor = {}
+  for owners_file in filter(None, owners_files):
+    owners_dir = os.path.dirname(os.path.normpath(owners_file))
+    owners_dir_by_ancestor[owners_dir] = owners_dir
+  # Maps the directories of |files| to their closest parent with an OWNERS
+  # file, so that files in the same directory are only resolved once.
+  dirs_with_owners = {}
+
   for action, path in files:
-    # normpath() is important to normalize separators here, in prepration for
-    # str.split() before. It would be nicer to use something like pathlib here
-    # but alas...
-    dir_with_owners = os.path.normpath(os.path.dirname(path))
-    if max_depth >= 1:
-      dir_with_owners = os.path.join(
-          *dir_with_owners.split(os.path.sep)[:max_depth])
-    # Find the closest parent directory with an OWNERS file.
-    while (dir_with_owners not in files_split_by_owners
-           and not os.path.isfile(os.path.join(dir_with_owners, 'OWNERS'))):
-      dir_with_owners = os.path.dirname(dir_with_owners)
-    files_split_by_owners.setdefault(dir_with_owners, []).append((action, path))
+    directory = os.path.dirname(path)
+    dir_with_owners = dirs_with_owners.get(directory)
+    if dir_with_owners is None:
+      # normpath() is important to normalize separators here, in prepration
+      # for str.split() below. It would be nicer to use something like pathlib
+      # here but alas...
+      parts = os.path.normpath(directory).split(os.path.sep)
+      if max_depth >= 1:
+        del parts[max_depth:]
+      # Find the closest parent directory with an OWNERS file, walking up by
+      # dropping path components rather than re-parsing the path each time.
+      visited = []
+      for i in range(len(parts), -1, -1):
+        dir_with_owners = os.path.sep.join(parts[:i])
+        if dir_with_owners in owners_dir_by_ancestor:
+          dir_with_owners = owners_dir_by_ancestor[dir_with_owners]
+          break
+        visited.append(dir_with_owners)
+      for ancestor in visited:
+        owners_dir_by_ancestor[ancestor] = dir_with_owners
+      dirs_with_owners[directory] = dir_with_owners
+    files_split_by_owners.setdefault(dir_with_owners, []).append(
+        (action.strip(), path))
   return files_split_by_owners
 
 
@@ -182,18 +233,20 @@ def PrintClInfo(cl_index, num_cls, directory, file_paths, description,
     enable_auto_submit: If the CL should also have auto submit enabled.
     topic: Topic to set for this CL.
   """
-  description_lines = FormatDescriptionOrComment(description,
-                                                 directory).splitlines()
-  indented_description = '\n'.join(['    ' + l for l in description_lines])
-
-  print('CL {}/{}'.format(cl_index, num_cls))
-  print('Path: {}'.format(directory))
-  print('Reviewers: {}'.format(', '.join(reviewers)))
-  print('Auto-Submit: {}'.format(enable_auto_submit))
-  print('Topic: {}'.format(topic))
-  print('\n' + indented_description + '\n')
-  print('\n'.join(file_paths))
-  print()
+  indented_description = '    ' + FormatDescriptionOrComment(
+      description, directory).replace('\n', '\n    ')
+
+  # Write all the info at once rather than line by line.
+  sys.stdout.write('CL {}/{}\n'
+                   'Path: {}\n'
+                   'Reviewers: {}\n'
+                   'Auto-Submit: {}\n'
+                   'Topic: {}\n'
+                   '\n{}\n\n'
+                   '{}\n\n'.format(cl_index, num_cls, directory,
+                                   ', '.join(reviewers), enable_auto_submit,
+                                   topic, indented_description,
+                                   '\n'.join(file_paths)))
 
 
 def SplitCl(description_file, comment_file, changelist, cmd_upload, dry_run,
@@ -224,12 +277,10 @@ def SplitCl(description_file, comment_file, changelist, cmd_upload, dry_run,
 
     cl = changelist()
     upstream = cl.GetCommonAncestorWithUpstream()
-    files = [
-        (action.strip(), f)
-        for action, f in scm.GIT.CaptureStatus(repository_root, upstream)
-    ]
+    files_split_by_owners = GetFilesSplitByOwners(
+        scm.GIT.CaptureStatus(repository_root, upstream), max_depth)
 
-    if not files:
+    if not files_split_by_owners:
       print('Cannot split an empty CL.')
       return 1
 
@@ -240,8 +291,6 @@ def SplitCl(description_file, comment_file, changelist, cmd_upload, dry_run,
     assert refactor_branch_upstream, \
         "Branch %s must have an upstream." % refactor_branch
 
-    files_split_by_owners = GetFilesSplitByOwners(files, max_depth)
-
     num_cls = len(files_split_by_owners)
     print('Will split current branch (' + refactor_branch + ') into ' +
           str(num_cls) + ' CLs.\n')
@@ -256,33 +305,49 @@ def SplitCl(description_file, comment_file, changelist, cmd_upload, dry_run,
       if answer.lower() != 'y':
         return 0
 
-    # Verify that the description contains a bug link. Examples:
-    #   Bug: 123
-    #   Bug: chromium:456
-    bug_pattern = re.compile(r"^Bug:\s*(?:[a-zA-Z]+:)?[0-9]+", re.MULTILINE)
-    matches = re.findall(bug_pattern, description)
+    # Verify that the description contains a bug link.
     answer = 'y'
-    if not matches:
+    if not BUG_RE.search(description):
       answer = gclient_utils.AskForData(
           'Description does not include a bug link. Proceed? (y/n):')
     if answer.lower() != 'y':
       return 0
 
+    # List branches once rather than once per directory. Dry runs don't create
+    # branches, so they don't need the list at all.
+    existing_branches = set() if dry_run else set(
+        git.branches(use_limit=False))
+
+    # Use '/' as a path separator in the branch name and the CL description
+    # and comment.
+    files_by_directory = {
+        directory.replace(os.path.sep, '/'): files
+        for directory, files in files_split_by_owners.items()
+    }
+    # Suggest reviewers for all CLs at once. Directories for which a branch
+    # already exists are skipped by UploadCl when resuming a split, so don't
+    # look up their owners.
+    reviewers_by_directory = cl.owners_client.BatchSuggestOwners(
+        {
+            directory: [f for _, f in files]
+            for directory, files in files_by_directory.items()
+            if dry_run or GetBranchName(refactor_branch, directory) not in
+            existing_branches
+        },
+        exclude=[author, cl.owners_client.EVERYONE])
+
     for cl_index, (directory, files) in \
-        enumerate(files_split_by_owners.items(), 1):
-      # Use '/' as a path separator in the branch name and the CL description
-      # and comment.
-      directory = directory.replace(os.path.sep, '/')
-      file_paths = [f for _, f in files]
-      reviewers = cl.owners_client.SuggestOwners(
-          file_paths, exclude=[author, cl.owners_client.EVERYONE])
+        enumerate(files_by_directory.items(), 1):
       if dry_run:
+        file_paths = [f for _, f in files]
         PrintClInfo(cl_index, num_cls, directory, file_paths, description,
-                    reviewers, enable_auto_submit, topic)
+                    reviewers_by_directory[directory], enable_auto_submit,
+                    topic)
       else:
         UploadCl(refactor_branch, refactor_branch_upstream, directory, files,
-                 description, comment, reviewers, changelist, cmd_upload,
-                 cq_dry_run, enable_auto_submit, topic, repository_root)
+                 description, comment, reviewers_by_directory.get(directory),
+                 changelist, cmd_upload, cq_dry_run, enable_auto_submit, topic,
+                 repository_root, existing_branches)
 
     # Go back to the original branch.
     git.run('checkout', refactor_branch)
@@ -236,6 +236,30 @@ class OwnersClientTest(unittest.TestCase):
     self.assertSuggestsOwners(
         {str(x): [str(x)] for x in range(100)})
 
+  def testBatchSuggestOwners(self):
+    self.client.owners_by_path = {
+        'a/foo': [alice, bob],
+        'a/bar': [bob],
+        'b/foo': [dave, chris],
+        'b/bar': [dave],
+    }
+    with mock.patch.object(self.client, 'BatchListOwners',
+                           wraps=self.client.BatchListOwners) as batch:
+      self.assertEqual(
+          {
+              'a': [bob],
+              'b': [dave],
+              'c': [],
+          },
+          self.client.BatchSuggestOwners(
+              {
+                  'a': ['a/foo', 'a/bar'],
+                  'b': ['b/foo', 'b/bar'],
+                  'c': [],
+              },
+              exclude=[alice]))
+    batch.assert_called_once_with({'a/foo', 'a/bar', 'b/foo', 'b/bar'})
+
   def testBatchListOwners(self):
     self.client.owners_by_path = {
         'bar/everyone/foo.txt': [alice, bob],
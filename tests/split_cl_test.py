@@ -1,9 +1,11 @@
 #!/usr/bin/env vpython3
 """Tests for split_cl."""
 
+import io
 import os
 import sys
 import unittest
+from unittest import mock
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -32,6 +34,79 @@ class SplitClTest(unittest.TestCase):
                                                       self._footers),
         self._description + added_line + '\n\n' + self._footers)
 
+  @mock.patch('git_common.run')
+  def testGetFilesSplitByOwners(self, mock_run):
+    mock_run.return_value = 'OWNERS\0a/OWNERS\0a/b/OWNERS\0'
+    files = [
+        ('M', os.path.join('a', 'b', 'c', 'foo.cc')),
+        ('M', os.path.join('a', 'b', 'c', 'bar.cc')),
+        ('D', os.path.join('a', 'x', 'y', 'baz.cc')),
+        ('A', os.path.join('a', 'x', 'z', 'qux.cc')),
+        ('M', os.path.join('x', 'y.cc')),
+        ('M', 'README.md'),
+    ]
+    # Actions as returned by scm.GIT.CaptureStatus() are padded.
+    status = [(action + '      ', path) for action, path in files]
+
+    self.assertEqual(
+        split_cl.GetFilesSplitByOwners(iter(status), 0), {
+            os.path.join('a', 'b'): files[0:2],
+            'a': files[2:4],
+            '': files[4:],
+        })
+    mock_run.assert_called_once_with('ls-files', '-z', '--full-name', '--',
+                                     ':(top,glob)**/OWNERS')
+
+  @mock.patch('git_common.run')
+  def testGetFilesSplitByOwnersMaxDepth(self, mock_run):
+    mock_run.return_value = 'a/OWNERS\0a/b/OWNERS\0a/b/c/OWNERS\0'
+    files = [
+        ('M', os.path.join('a', 'b', 'c', 'd', 'foo.cc')),
+        ('M', os.path.join('a', 'bar.cc')),
+    ]
+
+    self.assertEqual(split_cl.GetFilesSplitByOwners(files, 2), {
+        os.path.join('a', 'b'): files[0:1],
+        'a': files[1:],
+    })
+
+  @mock.patch('git_common.run')
+  def testCreateBranchForDirectory(self, mock_run):
+    existing_branches = {'refactor_foo_split'}
+
+    self.assertFalse(
+        split_cl.CreateBranchForDirectory('refactor', 'foo', 'origin/main',
+                                          existing_branches))
+    mock_run.assert_not_called()
+
+    self.assertTrue(
+        split_cl.CreateBranchForDirectory('refactor', 'bar', 'origin/main',
+                                          existing_branches))
+    mock_run.assert_called_once_with('checkout', '-t', 'origin/main', '-b',
+                                     'refactor_bar_split')
+    self.assertEqual(existing_branches,
+                     {'refactor_foo_split', 'refactor_bar_split'})
+
+  @mock.patch('sys.stdout', new_callable=io.StringIO)
+  def testPrintClInfo(self, mock_stdout):
+    split_cl.PrintClInfo(2, 3, 'foo/bar', ['foo/bar/a.cc', 'foo/bar/b.cc'],
+                         'Fix $directory\n\nBug: 123', ['alice', 'bob'],
+                         False, 'topic')
+    self.assertEqual(
+        mock_stdout.getvalue(), 'CL 2/3\n'
+        'Path: foo/bar\n'
+        'Reviewers: alice, bob\n'
+        'Auto-Submit: False\n'
+        'Topic: topic\n'
+        '\n'
+        '    Fix /foo/bar\n'
+        '    \n'
+        '    Bug: 123\n'
+        '\n'
+        'foo/bar/a.cc\n'
+        'foo/bar/b.cc\n'
+        '\n')
+
 
 if __name__ == '__main__':
   unittest.main()